@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from .chat import router as router_chat
 from .auth import router as router_auth
 from .form import router as router_form
+from .health import router as router_health
 
 router = APIRouter()
 
@@ -15,4 +16,8 @@ router.include_router(
 
 router.include_router(
     router_form
+)
+
+router.include_router(
+    router_health
 )
\ No newline at end of file
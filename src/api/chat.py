@@ -1,18 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
 
 from core.db_helper import db_helper
-from core.schemas.chat import ChatResponse, ChatCreate
+from core.schemas.chat import ChatResponse, ChatCreate, ChatBulkDelete, ChatBulkDeleteResponse
 from core.schemas.message import MessageResponse, MessageCreate, ChatMessageResponse
 from core.schemas.user import UserResponse
+from core.serializers import chat_to_dict, message_to_dict, export_ndjson
 from .auth import get_current_user
+from .deps import get_accessible_chat
+from .rate_limit import limit_chat_creation, limit_chat_messages
 import crud.chat as chat_crud
 
 router = APIRouter()
 
-@router.post("/chats/", response_model=ChatResponse)
+@router.post("/chats/", response_model=ChatResponse, dependencies=[Depends(limit_chat_creation)])
 async def create_chat(
     chat_data: ChatCreate = ChatCreate(),
     current_user: Optional[UserResponse] = Depends(get_current_user),
@@ -20,13 +25,14 @@ async def create_chat(
 ):
     # Если пользователь не авторизован, всегда создаем анонимный чат
     if current_user is None:
-        return await chat_crud.create_chat(db)
-    
-    # Для авторизованного пользователя учитываем его выбор (анонимный или персональный чат)
-    return await chat_crud.create_chat(
-        db, 
-        current_user.id if not chat_data.is_anonymous else None
-    )
+        chat = await chat_crud.create_chat(db)
+    else:
+        # Для авторизованного пользователя учитываем его выбор (анонимный или персональный чат)
+        chat = await chat_crud.create_chat(
+            db,
+            current_user.id if not chat_data.is_anonymous else None
+        )
+    return ORJSONResponse(chat_to_dict(chat))
 
 @router.get("/chats/", response_model=List[ChatResponse])
 async def list_chats(
@@ -40,7 +46,34 @@ async def list_chats(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Неавторизованные пользователи не могут просматривать список чатов. Используйте конкретный chat_id для доступа к своему анонимному чату."
         )
-    return await chat_crud.get_chats(db, current_user.id, skip=skip, limit=limit)
+    chats = await chat_crud.get_chats_data(db, current_user.id, skip=skip, limit=limit)
+    return ORJSONResponse(chats)
+
+async def _export_chunks(user_id: UUID, compress: bool):
+    # Сессия открывается внутри потока: сессия из зависимости может закрыться раньше, чем ответ будет отдан
+    async with db_helper.session_factory() as db:
+        async for chunk in export_ndjson(chat_crud.stream_chat_export(db, user_id), compress=compress):
+            yield chunk
+
+@router.get("/chats/export")
+async def export_chats(
+    gzip: bool = False,
+    current_user: Optional[UserResponse] = Depends(get_current_user)
+):
+    """
+    Выгрузка всех чатов пользователя с сообщениями в NDJSON потоком из БД.
+    """
+    if current_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Неавторизованные пользователи не могут выгружать чаты."
+        )
+    filename = "chats.ndjson.gz" if gzip else "chats.ndjson"
+    return StreamingResponse(
+        _export_chunks(current_user.id, gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/chats/{chat_id}", response_model=ChatResponse)
 async def get_chat(
@@ -48,39 +81,68 @@ async def get_chat(
     current_user: Optional[UserResponse] = Depends(get_current_user),
     db: AsyncSession = Depends(db_helper.session_getter)
 ):
-    chat = await chat_crud.get_chat(db, chat_id, current_user.id if current_user else None)
+    chat = await chat_crud.get_chat_data(db, chat_id, current_user.id if current_user else None)
     if chat is None:
         raise HTTPException(status_code=404, detail="Chat not found")
     
     # Проверяем доступ к чату
-    if not chat.is_anonymous and (current_user is None or chat.user_id != current_user.id):
+    if not chat["is_anonymous"] and (current_user is None or chat["user_id"] != current_user.id):
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return chat
+    return ORJSONResponse(chat)
 
-@router.post("/chats/{chat_id}/messages/", response_model=ChatMessageResponse)
+@router.post(
+    "/chats/{chat_id}/messages/",
+    response_model=ChatMessageResponse,
+    dependencies=[Depends(limit_chat_messages)]
+)
 async def add_message(
     chat_id: UUID,
     message: MessageCreate,
-    current_user: Optional[UserResponse] = Depends(get_current_user),
+    chat: RowMapping = Depends(get_accessible_chat),
     db: AsyncSession = Depends(db_helper.session_getter)
 ):
-    chat = await chat_crud.get_chat(db, chat_id, current_user.id if current_user else None)
-    if chat is None:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Проверяем доступ к чату
-    if not chat.is_anonymous and (current_user is None or chat.user_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
+    # Доступ уже проверен в get_accessible_chat по полям чата, история придет из кэша в add_message
+
     # Получаем оба сообщения: пользователя и ассистента
     user_message, assistant_message = await chat_crud.add_message(db, chat_id, message.content)
     
-    return ChatMessageResponse(
-        user_message=user_message,
-        assistant_message=assistant_message
-    )
+    return ORJSONResponse({
+        "user_message": message_to_dict(user_message),
+        "assistant_message": message_to_dict(assistant_message)
+    })
+
 
+@router.post("/chats/delete", response_model=ChatBulkDeleteResponse)
+async def delete_chats(
+    params: ChatBulkDelete,
+    current_user: Optional[UserResponse] = Depends(get_current_user),
+    db: AsyncSession = Depends(db_helper.session_getter)
+):
+    """
+    Массовое удаление чатов. Нужно указать chat_ids, older_than или оба условия;
+    условия объединяются через И: при обоих удаляются только чаты из списка,
+    созданные раньше older_than.
+    older_than без часового пояса считается UTC.
+    """
+    if not params.chat_ids and params.older_than is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Укажите chat_ids или older_than"
+        )
+    # Иначе анонимный пользователь мог бы удалить чужие анонимные чаты по дате
+    if current_user is None and params.older_than is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Неавторизованные пользователи могут удалять чаты только по chat_id."
+        )
+    deleted = await chat_crud.delete_chats(
+        db,
+        current_user.id if current_user else None,
+        chat_ids=params.chat_ids,
+        older_than=params.older_than
+    )
+    return ORJSONResponse({"deleted": len(deleted), "chat_ids": deleted})
 
 @router.delete("/chats/{chat_id}")
 async def delete_chat(
@@ -88,14 +150,7 @@ async def delete_chat(
     current_user: Optional[UserResponse] = Depends(get_current_user),
     db: AsyncSession = Depends(db_helper.session_getter)
 ):
-    chat = await chat_crud.get_chat(db, chat_id, current_user.id if current_user else None)
-    if chat is None:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    
-    # Проверяем доступ к чату
-    if not chat.is_anonymous and (current_user is None or chat.user_id != current_user.id):
-        raise HTTPException(status_code=403, detail="Access denied")
-    
+    # Доступ проверяется в самом DELETE: чужой или несуществующий чат не удалится
     success = await chat_crud.delete_chat(db, chat_id, current_user.id if current_user else None)
     if not success:
         raise HTTPException(status_code=404, detail="Chat not found")
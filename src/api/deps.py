@@ -0,0 +1,29 @@
+from typing import Optional
+from uuid import UUID
+from fastapi import Depends, HTTPException
+from sqlalchemy import RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db_helper import db_helper
+from core.schemas.user import UserResponse
+from .auth import get_current_user
+import crud.chat as chat_crud
+
+
+async def get_accessible_chat(
+    chat_id: UUID,
+    current_user: Optional[UserResponse] = Depends(get_current_user),
+    db: AsyncSession = Depends(db_helper.session_getter)
+) -> RowMapping:
+    """
+    Поля чата после проверки доступа. FastAPI кэширует зависимость в пределах запроса,
+    поэтому лимитер и эндпоинт делят один запрос к БД.
+    """
+    chat = await chat_crud.get_chat_access(db, chat_id, current_user.id if current_user else None)
+    if chat is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    # Проверяем доступ к чату
+    if not chat["is_anonymous"] and (current_user is None or chat["user_id"] != current_user.id):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return chat
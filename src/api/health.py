@@ -0,0 +1,38 @@
+import asyncio
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+from core.db_helper import db_helper
+from core.warmup import warmup_state
+
+router = APIRouter(prefix="/health")
+
+@router.get("/live")
+async def live():
+    """
+    Процесс жив и обслуживает event loop.
+    """
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    """
+    Воркер прогрет и БД отвечает. Доступность AI-провайдера и пул соединений
+    возвращаются для диагностики, но готовность от провайдера не зависит.
+    """
+    try:
+        await asyncio.wait_for(db_helper.ping(), timeout=2.0)
+        database = True
+    except Exception:
+        database = False
+
+    is_ready = warmup_state.warm and database
+    body = {
+        "status": "ready" if is_ready else "not_ready",
+        "warm": warmup_state.warm,
+        "database": database,
+        "pool": db_helper.pool_status(),
+        # Значение из фоновой проверки, сама проба к провайдеру не обращается
+        "ai_reachable": warmup_state.ai_reachable,
+    }
+    return ORJSONResponse(body, status_code=200 if is_ready else 503)
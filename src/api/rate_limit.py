@@ -0,0 +1,68 @@
+import math
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import RowMapping
+
+from core.rate_limit import rate_limit_store, generation_limiter, Bucket
+from core.schemas.user import UserResponse
+from core.settings import settings
+from .auth import get_current_user
+from .deps import get_accessible_chat
+
+
+def get_client_key(request: Request, current_user: Optional[UserResponse]) -> str:
+    # Авторизованных различаем по id, анонимных - по IP
+    if current_user is not None:
+        return f"user:{current_user.id}"
+    host = request.client.host if request.client else "unknown"
+    return f"ip:{host}"
+
+
+def _too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Слишком много запросов. Повторите попытку позже.",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def _consume(*buckets: Bucket):
+    retry_after = await rate_limit_store.consume(buckets)
+    if retry_after > 0:
+        raise _too_many_requests(retry_after)
+
+
+async def limit_chat_creation(
+    request: Request,
+    current_user: Optional[UserResponse] = Depends(get_current_user)
+):
+    config = settings.rate_limit
+    if not config.enabled:
+        return
+    client_key = get_client_key(request, current_user)
+    await _consume((f"chat_create:{client_key}", config.chat_create_capacity, config.chat_create_rate))
+
+
+async def limit_chat_messages(
+    request: Request,
+    current_user: Optional[UserResponse] = Depends(get_current_user),
+    # Доступ проверяется до списания: чужие запросы с 403/404 не тратят лимит чата
+    chat: RowMapping = Depends(get_accessible_chat)
+):
+    config = settings.rate_limit
+    if not config.enabled:
+        yield
+        return
+    client_key = get_client_key(request, current_user)
+    await _consume(
+        (f"message:{client_key}", config.message_capacity, config.message_rate),
+        (f"chat:{chat['id']}", config.chat_message_capacity, config.chat_message_rate),
+    )
+
+    # Один клиент не может занять все соединения к AI-провайдеру
+    if not generation_limiter.acquire(client_key):
+        raise _too_many_requests(1)
+    try:
+        yield
+    finally:
+        generation_limiter.release(client_key)
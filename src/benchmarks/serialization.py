@@ -0,0 +1,80 @@
+"""
+Микробенчмарк сериализации списка чатов: 100 чатов, 1000 сообщений.
+
+before - как раньше: ORM-объекты -> валидация List[ChatResponse] -> orjson
+after  - как сейчас: строки колонок (Row) -> build_chats -> orjson
+
+Запуск из каталога src: python -m benchmarks.serialization
+"""
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from core.models.chat import Chat, Message
+from core.schemas.chat import ChatResponse
+from core.serializers import CHAT_FIELDS, MESSAGE_FIELDS, build_chats
+
+CHATS = 100
+MESSAGES_PER_CHAT = 10
+ROUNDS = 50
+
+
+def build_rows():
+    now = datetime(2025, 1, 1, 12, 0, 0)
+    user_id = uuid.uuid4()
+    chat_rows, message_rows = [], []
+    message_id = 0
+    for i in range(CHATS):
+        chat_id = uuid.uuid4()
+        chat_rows.append((chat_id, now + timedelta(minutes=i), user_id, False))
+        for j in range(MESSAGES_PER_CHAT):
+            message_id += 1
+            message_rows.append((
+                message_id, chat_id, f"Сообщение {j} в чате {i}. " * 5, j % 2 == 1,
+                now + timedelta(minutes=i, seconds=j, microseconds=123)
+            ))
+    return chat_rows, message_rows
+
+
+def build_orm(chat_rows, message_rows):
+    chats = {row[0]: Chat(**dict(zip(CHAT_FIELDS, row))) for row in chat_rows}
+    for row in message_rows:
+        message = Message(**dict(zip(MESSAGE_FIELDS, row)))
+        chats[message.chat_id].messages.append(message)
+    return list(chats.values())
+
+
+def to_rows(fields, rows):
+    # Те же Row, что отдает result.all() в crud, но без БД
+    return IteratorResult(SimpleResultMetaData(fields), iter(rows)).all()
+
+
+def main():
+    chat_rows, message_rows = build_rows()
+    orm_chats = build_orm(chat_rows, message_rows)
+    adapter = TypeAdapter(List[ChatResponse])
+
+    def before():
+        validated = adapter.validate_python(orm_chats, from_attributes=True)
+        return orjson.dumps(adapter.dump_python(validated, mode="json"))
+
+    chat_result = to_rows(CHAT_FIELDS, chat_rows)
+    message_result = to_rows(MESSAGE_FIELDS, message_rows)
+
+    def after():
+        return orjson.dumps(build_chats(chat_result, message_result))
+
+    assert orjson.loads(before()) == orjson.loads(after())
+
+    for name, func in (("before", before), ("after", after)):
+        best = min(timeit.repeat(func, number=ROUNDS, repeat=5)) / ROUNDS
+        print(f"{name:>6}: {best * 1000:.3f} ms на {CHATS} чатов / {CHATS * MESSAGES_PER_CHAT} сообщений")
+
+
+if __name__ == "__main__":
+    main()
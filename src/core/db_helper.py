@@ -1,3 +1,6 @@
+import asyncio
+from typing import Dict
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from core.settings import settings
 
@@ -26,6 +29,23 @@ class DatabaseHelper:
             expire_on_commit=False
         )
 
+    async def ping(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def warmup(self, connections: int):
+        # Одновременные ping открывают разные соединения, после чего они остаются в пуле
+        await asyncio.gather(*(self.ping() for _ in range(connections)))
+
+    def pool_status(self) -> Dict[str, int]:
+        pool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+
     async def dispose(self):
         await self.engine.dispose()
 
@@ -38,6 +58,6 @@ db_helper = DatabaseHelper(
     url=str(settings.db.url),
     echo = settings.db.echo,
     echo_pool = settings.db.echo_pool,
-    pool_size = settings.db.pool_size,
-    max_overflow = settings.db.max_overflow,
+    pool_size = settings.worker_db_pool_size,
+    max_overflow = settings.worker_db_max_overflow,
 )
@@ -0,0 +1,127 @@
+import sys
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from core.settings import settings
+
+# Запись истории: (id сообщения, is_assistant, content)
+CachedMessage = Tuple[int, bool, str]
+
+# Примерные накладные расходы на кортеж записи и int, без учета самой строки
+_ENTRY_OVERHEAD = 120
+
+
+def _entry_size(entry: CachedMessage) -> int:
+    return _ENTRY_OVERHEAD + sys.getsizeof(entry[2])
+
+
+class _ChatEntry:
+    __slots__ = ("messages", "synced_id", "size")
+
+    def __init__(self, messages: List[CachedMessage], synced_id: int, size: int):
+        self.messages = messages
+        # Последний id, прочитанный из БД; записанное после него пришло write-through
+        self.synced_id = synced_id
+        self.size = size
+
+
+class ChatHistoryCache:
+    """
+    Write-through кэш истории активных чатов в памяти воркера.
+
+    Чаты вытесняются по LRU, когда суммарный размер превышает max_bytes.
+    Записи упорядочены по id сообщения, поэтому при попадании достаточно
+    догрузить из БД сообщения новее synced_id (например, записанные другим воркером).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._chats: "OrderedDict[UUID, _ChatEntry]" = OrderedDict()
+        self._total = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def get(self, chat_id: UUID) -> Optional[List[CachedMessage]]:
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            return None
+        self._chats.move_to_end(chat_id)
+        return entry.messages
+
+    def synced_id(self, chat_id: UUID) -> Optional[int]:
+        entry = self._chats.get(chat_id)
+        return entry.synced_id if entry else None
+
+    def set(self, chat_id: UUID, messages: Iterable[CachedMessage]) -> None:
+        """Кладет полную историю чата, прочитанную из БД."""
+        self.invalidate(chat_id)
+        history = list(messages)
+        size = sum(_entry_size(message) for message in history)
+        if size > self.max_bytes:
+            # Чат больше всего кэша - читаем его из БД
+            return
+        self._chats[chat_id] = _ChatEntry(history, history[-1][0] if history else 0, size)
+        self._total += size
+        self._evict()
+
+    def append(self, chat_id: UUID, message: CachedMessage) -> None:
+        """Write-through только что сохраненного сообщения, если чат уже в кэше."""
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            return
+        if entry.messages and message[0] <= entry.messages[-1][0]:
+            # Параллельные запросы записали сообщения не по порядку - проще перечитать чат
+            self.invalidate(chat_id)
+            return
+        self._add(chat_id, entry, message)
+
+    def sync(self, chat_id: UUID, messages: Iterable[CachedMessage]) -> None:
+        """Сливает сообщения из БД с id больше synced_id, отсортированные по id."""
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            return
+        # Записанное write-through после synced_id - непрерывный хвост списка
+        written_ids = set()
+        for cached in reversed(entry.messages):
+            if cached[0] <= entry.synced_id:
+                break
+            written_ids.add(cached[0])
+        for message in messages:
+            if message[0] not in written_ids:
+                if entry.messages and message[0] < entry.messages[-1][0]:
+                    # Чужое сообщение оказалось между закэшированными - перечитаем чат целиком
+                    self.invalidate(chat_id)
+                    return
+                if not self._add(chat_id, entry, message):
+                    return
+            entry.synced_id = message[0]
+
+    def invalidate(self, chat_id: UUID) -> None:
+        entry = self._chats.pop(chat_id, None)
+        if entry is not None:
+            self._total -= entry.size
+
+    def clear(self) -> None:
+        self._chats.clear()
+        self._total = 0
+
+    def _add(self, chat_id: UUID, entry: _ChatEntry, message: CachedMessage) -> bool:
+        size = _entry_size(message)
+        entry.messages.append(message)
+        entry.size += size
+        self._total += size
+        self._chats.move_to_end(chat_id)
+        self._evict()
+        # False, если чат сам по себе перерос кэш и был вытеснен
+        return chat_id in self._chats
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._chats:
+            _, entry = self._chats.popitem(last=False)
+            self._total -= entry.size
+
+
+chat_history_cache = ChatHistoryCache(max_bytes=settings.history_cache.max_bytes)
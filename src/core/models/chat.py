@@ -29,7 +29,8 @@ class Chat(Base):
     is_anonymous = Column(Boolean, default=False, nullable=False)
     
     user = relationship("User", back_populates="chats")
-    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", lazy="selectin")
+    # Сообщения удаляет ON DELETE CASCADE в БД, ORM не выбирает их перед удалением чата
+    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", lazy="selectin", passive_deletes=True)
 
 class Message(Base):
     __tablename__ = "message"
@@ -0,0 +1,150 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Sequence, Tuple
+
+from core.settings import settings, RateLimitConfig
+
+
+# Корзина для списания: (ключ, емкость, скорость пополнения в токенах в секунду)
+Bucket = Tuple[str, int, float]
+
+
+class RateLimitStore(ABC):
+    """
+    Хранилище корзин токенов. consume списывает cost из всех корзин сразу или ни из одной
+    и возвращает 0, если запрос разрешен, иначе сколько секунд ждать.
+    """
+
+    @abstractmethod
+    async def consume(self, buckets: Sequence[Bucket], cost: int = 1) -> float:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Корзины в памяти воркера с вытеснением давно не использованных ключей."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # Ключ -> (токены, время последнего обновления); порядок = давность использования
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def consume(self, buckets: Sequence[Bucket], cost: int = 1) -> float:
+        now = time.monotonic()
+        refilled = []
+        retry_after = 0.0
+        for key, capacity, rate in buckets:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens < cost:
+                wait = (cost - tokens) / rate if rate > 0 else float(capacity)
+                retry_after = max(retry_after, wait)
+            refilled.append((key, tokens))
+
+        for key, tokens in refilled:
+            # Списываем только если хватило во всех корзинах
+            self._buckets[key] = (tokens - cost if retry_after == 0 else tokens, now)
+        # Вытесненная корзина за время простоя все равно бы наполнилась до capacity
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """Корзины в Redis, общие для всех воркеров и инстансов."""
+
+    # Время берется из Redis, чтобы не зависеть от расхождения часов между хостами.
+    # ARGV: cost, затем пары (capacity, rate) в порядке KEYS
+    SCRIPT = """
+    local cost = tonumber(ARGV[1])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local levels = {}
+    local retry_after = 0
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[i * 2])
+        local rate = tonumber(ARGV[i * 2 + 1])
+        local state = redis.call('HMGET', key, 'tokens', 'ts')
+        local tokens = tonumber(state[1]) or capacity
+        local ts = tonumber(state[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+        if tokens < cost then
+            local wait = capacity
+            if rate > 0 then
+                wait = (cost - tokens) / rate
+            end
+            retry_after = math.max(retry_after, wait)
+        end
+        levels[i] = tokens
+    end
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[i * 2])
+        local rate = tonumber(ARGV[i * 2 + 1])
+        local tokens = levels[i]
+        if retry_after == 0 then
+            tokens = tokens - cost
+        end
+        redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+        if rate > 0 then
+            redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+        end
+    end
+    return tostring(retry_after)
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError(
+                "Для CONFIG__RATE_LIMIT__REDIS_URL нужен пакет redis: pip install 'neuroprom-back[redis]'"
+            ) from e
+        self.prefix = prefix
+        self._redis = redis_asyncio.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def consume(self, buckets: Sequence[Bucket], cost: int = 1) -> float:
+        keys = [self.prefix + key for key, _, _ in buckets]
+        args = [cost]
+        for _, capacity, rate in buckets:
+            args.extend((capacity, rate))
+        result = await self._script(keys=keys, args=args)
+        return float(result)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class ConcurrencyLimiter:
+    """Ограничивает число одновременных генераций на одного клиента в пределах воркера."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._active: Dict[str, int] = {}
+
+    def acquire(self, key: str) -> bool:
+        count = self._active.get(key, 0)
+        if count >= self.limit:
+            return False
+        self._active[key] = count + 1
+        return True
+
+    def release(self, key: str) -> None:
+        count = self._active.get(key, 0) - 1
+        if count > 0:
+            self._active[key] = count
+        else:
+            self._active.pop(key, None)
+
+
+def create_store(config: RateLimitConfig) -> RateLimitStore:
+    if config.redis_url:
+        return RedisRateLimitStore(config.redis_url)
+    return MemoryRateLimitStore(max_keys=config.max_keys)
+
+
+rate_limit_store = create_store(settings.rate_limit)
+generation_limiter = ConcurrencyLimiter(settings.rate_limit.max_concurrent_generations)
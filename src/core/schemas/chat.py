@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from .message import MessageResponse
 
@@ -17,4 +17,20 @@ class ChatResponse(ChatBase):
     messages: List[MessageResponse] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ChatBulkDelete(BaseModel):
+    chat_ids: List[UUID] = Field(default_factory=list, max_length=1000)
+    older_than: Optional[datetime] = None
+
+    @field_validator("older_than")
+    @classmethod
+    def to_naive_utc(cls, v: Optional[datetime]) -> Optional[datetime]:
+        # created_at хранится как naive UTC
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+class ChatBulkDeleteResponse(BaseModel):
+    deleted: int
+    chat_ids: List[UUID]
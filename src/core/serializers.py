@@ -0,0 +1,92 @@
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Sequence
+
+import orjson
+from sqlalchemy import Row
+
+from core.models.chat import Chat, Message
+
+# Ответы горячих эндпоинтов собираются в dict и кодируются orjson один раз,
+# минуя повторную валидацию через response_model. Ключи совпадают со схемами
+# ChatResponse и MessageResponse, поэтому OpenAPI-схема остается прежней.
+
+MESSAGE_FIELDS = ("id", "chat_id", "content", "is_assistant", "timestamp")
+CHAT_FIELDS = ("id", "created_at", "user_id", "is_anonymous")
+
+
+def message_to_dict(message: Message) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "chat_id": message.chat_id,
+        "content": message.content,
+        "is_assistant": message.is_assistant,
+        "timestamp": message.timestamp,
+    }
+
+
+def chat_to_dict(chat: Chat) -> Dict[str, Any]:
+    """Только что созданный чат, сообщений у него еще нет."""
+    return {
+        "id": chat.id,
+        "created_at": chat.created_at,
+        "user_id": chat.user_id,
+        "is_anonymous": chat.is_anonymous,
+        "messages": [],
+    }
+
+
+def build_chats(chat_rows: Iterable[Sequence[Any]], message_rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    Собирает ответ ChatResponse из строк, выбранных по колонкам CHAT_FIELDS и
+    MESSAGE_FIELDS (в этом порядке). Сообщения сохраняют порядок message_rows.
+    """
+    chats = []
+    by_chat = {}
+    for row in chat_rows:
+        chat = dict(zip(CHAT_FIELDS, row))
+        chat["messages"] = []
+        chats.append(chat)
+        by_chat[chat["id"]] = chat["messages"]
+    for row in message_rows:
+        message = dict(zip(MESSAGE_FIELDS, row))
+        by_chat[message["chat_id"]].append(message)
+    return chats
+
+
+async def export_ndjson(partitions: AsyncIterable[Sequence[Row]], compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Кодирует строки stream_chat_export в NDJSON: строка "chat", за ней строки "message"
+    этого чата. Каждая пачка строк отдается одним куском, при compress - через gzip.
+    """
+    # wbits=31 - формат gzip с заголовком и контрольной суммой
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    current_chat_id = None
+    async for rows in partitions:
+        lines = []
+        for row in rows:
+            if row.chat_id != current_chat_id:
+                current_chat_id = row.chat_id
+                lines.append(orjson.dumps({
+                    "type": "chat",
+                    "id": row.chat_id,
+                    "created_at": row.created_at,
+                    "is_anonymous": row.is_anonymous,
+                }))
+            if row.message_id is not None:
+                lines.append(orjson.dumps({
+                    "type": "message",
+                    "id": row.message_id,
+                    "chat_id": row.chat_id,
+                    "content": row.content,
+                    "is_assistant": row.is_assistant,
+                    "timestamp": row.timestamp,
+                }))
+        if not lines:
+            continue
+        chunk = b"\n".join(lines) + b"\n"
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
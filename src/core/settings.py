@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 from pydantic import PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -6,6 +7,14 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class RunConfig(BaseModel):
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = 1
+    # "auto" берет uvloop, если он установлен (на Windows его нет)
+    loop: str = "auto"
+    http: str = "httptools"
+    # Сколько секунд uvicorn ждет завершения активных запросов (и генераций в них) после SIGTERM
+    graceful_shutdown_timeout: int = 30
+    # Адреса прокси, которым доверяем X-Forwarded-For (нужно для лимитов по IP)
+    forwarded_allow_ips: str = "127.0.0.1"
 
 
 class ApiPrefix(BaseModel):
@@ -16,14 +25,49 @@ class DatabaseConfig(BaseModel):
     url: PostgresDsn
     echo: bool = False
     echo_pool: bool = False
+    # Общий бюджет соединений на все воркеры, делится поровну между процессами
     pool_size: int = 50
     max_overflow: int = 10
+    # Сколько соединений пула каждый воркер открывает заранее при старте
+    warmup_connections: int = 5
 
 
 class AIConfig(BaseModel):
     url: str
     api_key: str
     model: str
+    timeout: float = 30.0
+    # Общий бюджет соединений к AI-провайдеру на все воркеры
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    # Открывать соединение с провайдером при старте воркера и периодически проверять его доступность
+    warmup: bool = True
+
+
+class RateLimitConfig(BaseModel):
+    enabled: bool = True
+    # Корзины токенов: емкость и скорость пополнения в токенах в секунду
+    chat_create_capacity: int = 10
+    chat_create_rate: float = 10 / 60
+    message_capacity: int = 20
+    message_rate: float = 20 / 60
+    chat_message_capacity: int = 10
+    chat_message_rate: float = 10 / 60
+    # Сколько генераций один клиент может держать одновременно в одном воркере
+    max_concurrent_generations: int = 2
+    # Сколько корзин держать в памяти воркера до вытеснения самых старых
+    max_keys: int = 100_000
+    # Если задан, счетчики хранятся в Redis и общие для всех воркеров
+    redis_url: Optional[str] = None
+
+
+class HistoryCacheConfig(BaseModel):
+    enabled: bool = True
+    # Предел памяти воркера под историю активных чатов
+    max_bytes: int = 64 * 1024 * 1024
+    # Догружать из БД сообщения, записанные другими процессами, при попадании в кэш.
+    # None - только если воркеров больше одного; при нескольких инстансах задайте True
+    sync_on_hit: Optional[bool] = None
 
 
 class Settings(BaseSettings):
@@ -38,6 +82,30 @@ class Settings(BaseSettings):
     db: DatabaseConfig
     secret_key: str
     ai: AIConfig
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    history_cache: HistoryCacheConfig = HistoryCacheConfig()
+
+    @property
+    def history_cache_sync_on_hit(self) -> bool:
+        if self.history_cache.sync_on_hit is not None:
+            return self.history_cache.sync_on_hit
+        return self.run.workers > 1
+
+    @property
+    def worker_db_pool_size(self) -> int:
+        return max(1, self.db.pool_size // self.run.workers)
+
+    @property
+    def worker_db_max_overflow(self) -> int:
+        return self.db.max_overflow // self.run.workers
+
+    @property
+    def worker_ai_max_connections(self) -> int:
+        return max(1, self.ai.max_connections // self.run.workers)
+
+    @property
+    def worker_ai_max_keepalive_connections(self) -> int:
+        return max(1, self.ai.max_keepalive_connections // self.run.workers)
 
 
 settings = Settings()
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import orjson
+
+from auth.jwt import get_password_hash
+from core.db_helper import db_helper
+from core.neural_network import check_ai_connection
+from core.schemas.chat import ChatResponse
+from core.schemas.message import ChatMessageResponse
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Как часто фоновая задача перепроверяет доступность AI-провайдера
+AI_CHECK_INTERVAL = 30.0
+# Предел ожидания соединений с БД при старте, чтобы недоступная БД не блокировала запуск
+WARMUP_TIMEOUT = 10.0
+
+
+class WarmupState:
+    """
+    Готовность воркера. Доступность AI-провайдера обновляет фоновая задача,
+    чтобы /health/ready отдавал готовое значение и не ходил к провайдеру сам.
+    """
+
+    def __init__(self):
+        self.warm = False
+        self.ai_reachable: Optional[bool] = None
+        self._ai_monitor: Optional[asyncio.Task] = None
+
+    def start_ai_monitor(self):
+        self._ai_monitor = asyncio.create_task(self._monitor_ai())
+
+    async def stop_ai_monitor(self):
+        if self._ai_monitor is None:
+            return
+        self._ai_monitor.cancel()
+        try:
+            await self._ai_monitor
+        except asyncio.CancelledError:
+            pass
+        self._ai_monitor = None
+
+    async def _monitor_ai(self):
+        while True:
+            if self.ai_reachable is not None:
+                await asyncio.sleep(AI_CHECK_INTERVAL)
+            try:
+                self.ai_reachable = await check_ai_connection()
+            except Exception as e:
+                logger.error(f"Ошибка проверки AI-провайдера: {e}", exc_info=True)
+                self.ai_reachable = False
+
+
+warmup_state = WarmupState()
+
+
+def _warm_cpu_paths():
+    # Первые вызовы bcrypt, pydantic-валидаторов и orjson заметно медленнее последующих
+    now = datetime.utcnow()
+    chat_id = uuid.uuid4()
+    message: Dict[str, Any] = {
+        "id": 1, "chat_id": chat_id, "content": "warmup", "is_assistant": False, "timestamp": now
+    }
+    chat: Dict[str, Any] = {
+        "id": chat_id, "created_at": now, "user_id": None, "is_anonymous": True, "messages": [message]
+    }
+    ChatResponse.model_validate(chat).model_dump(mode="json")
+    ChatMessageResponse.model_validate({"user_message": message, "assistant_message": message})
+    orjson.dumps(chat)
+    get_password_hash("warmup")
+
+
+async def warm_up():
+    """Прогревает воркер перед приемом трафика. Ошибки не валят старт, их покажет /health/ready."""
+    started = time.monotonic()
+    connections = min(settings.db.warmup_connections, settings.worker_db_pool_size)
+    try:
+        await asyncio.wait_for(db_helper.warmup(connections), timeout=WARMUP_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Не удалось прогреть пул соединений с БД: {e}", exc_info=True)
+
+    # Без прогрева провайдер не запрашивается вовсе, ai_reachable в /health/ready остается None
+    if settings.ai.warmup:
+        warmup_state.ai_reachable = await check_ai_connection()
+        warmup_state.start_ai_monitor()
+
+    try:
+        await asyncio.to_thread(_warm_cpu_paths)
+    except Exception as e:
+        logger.error(f"Ошибка прогрева сериализаторов и bcrypt: {e}", exc_info=True)
+
+    warmup_state.warm = True
+    logger.info(f"Воркер прогрет за {time.monotonic() - started:.2f} с")
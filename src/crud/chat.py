@@ -1,10 +1,13 @@
-from typing import List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, delete, Row, RowMapping
 from core.models.chat import Chat, Message
 from core.neural_network import get_ai_response
+from core.history_cache import chat_history_cache, CachedMessage
+from core.settings import settings
+from core.serializers import CHAT_FIELDS, MESSAGE_FIELDS, build_chats
 from uuid import UUID
+from datetime import datetime
 
 async def create_chat(db: AsyncSession, user_id: Optional[UUID] = None) -> Chat:
     chat = Chat(
@@ -16,35 +19,95 @@ async def create_chat(db: AsyncSession, user_id: Optional[UUID] = None) -> Chat:
     await db.refresh(chat)
     return chat
 
-async def get_chat(db: AsyncSession, chat_id: UUID, user_id: Optional[UUID] = None) -> Optional[Chat]:
-    stmt = select(Chat).where(Chat.id == chat_id)
+def _chat_access_filter(stmt, user_id: Optional[UUID]):
+    # Авторизованный видит только свои чаты, анонимный - только анонимные
     if user_id is not None:
-        # Для авторизованного пользователя показываем только его чаты
-        stmt = stmt.where(Chat.user_id == user_id)
+        return stmt.where(Chat.user_id == user_id)
+    return stmt.where(Chat.is_anonymous.is_(True))
+
+async def _attach_messages(db: AsyncSession, chat_rows: Sequence[Row]) -> List[Dict[str, Any]]:
+    if not chat_rows:
+        return []
+    stmt = (
+        select(*(getattr(Message, name) for name in MESSAGE_FIELDS))
+        .where(Message.chat_id.in_([row.id for row in chat_rows]))
+        .order_by(Message.timestamp, Message.id)
+    )
     result = await db.execute(stmt)
-    chat = result.scalar_one_or_none()
-    
-    # Для анонимного пользователя показываем только текущий чат и только если он анонимный
-    if user_id is None and chat and not chat.is_anonymous:
+    return build_chats(chat_rows, result.all())
+
+async def get_chat_access(db: AsyncSession, chat_id: UUID, user_id: Optional[UUID] = None) -> Optional[RowMapping]:
+    """Поля чата для проверки доступа, без загрузки сообщений."""
+    stmt = select(Chat.id, Chat.user_id, Chat.is_anonymous).where(Chat.id == chat_id)
+    stmt = _chat_access_filter(stmt, user_id)
+    return (await db.execute(stmt)).mappings().one_or_none()
+
+async def get_chat_data(db: AsyncSession, chat_id: UUID, user_id: Optional[UUID] = None) -> Optional[Dict[str, Any]]:
+    """Чат с сообщениями в виде dict, выбранный по колонкам без загрузки ORM-объектов."""
+    stmt = select(*(getattr(Chat, name) for name in CHAT_FIELDS)).where(Chat.id == chat_id)
+    stmt = _chat_access_filter(stmt, user_id)
+    row = (await db.execute(stmt)).one_or_none()
+    if row is None:
         return None
-        
-    return chat
+    chats = await _attach_messages(db, [row])
+    return chats[0]
 
-async def get_chats(db: AsyncSession, user_id: Optional[UUID] = None, skip: int = 0, limit: int = 100) -> List[Chat]:
-    if user_id is not None:
-        # Для авторизованного пользователя показываем только его чаты
-        stmt = select(Chat).where(Chat.user_id == user_id)
-        stmt = stmt.offset(skip).limit(limit)
-        result = await db.execute(stmt)
-        return list(result.scalars().all())
-    else:
+async def get_chats_data(db: AsyncSession, user_id: Optional[UUID] = None, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    """Список чатов пользователя с сообщениями в виде dict для быстрой сериализации."""
+    if user_id is None:
         # Для неавторизованного пользователя не показываем список чатов
         return []
-
-async def get_chat_messages(db: AsyncSession, chat_id: UUID) -> List[Message]:
-    stmt = select(Message).where(Message.chat_id == chat_id).order_by(Message.timestamp)
+    stmt = select(*(getattr(Chat, name) for name in CHAT_FIELDS)).where(Chat.user_id == user_id)
+    stmt = stmt.offset(skip).limit(limit)
     result = await db.execute(stmt)
-    return list(result.scalars().all())
+    return await _attach_messages(db, result.all())
+
+async def stream_chat_export(db: AsyncSession, user_id: UUID, batch_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+    """
+    Все чаты пользователя с сообщениями через серверный курсор, пачками по batch_size
+    строк. Строки упорядочены по чату, поэтому в памяти не держится больше одной пачки.
+    """
+    stmt = (
+        select(
+            Chat.id.label("chat_id"),
+            Chat.created_at,
+            Chat.is_anonymous,
+            Message.id.label("message_id"),
+            Message.content,
+            Message.is_assistant,
+            Message.timestamp,
+        )
+        .outerjoin(Message, Message.chat_id == Chat.id)
+        .where(Chat.user_id == user_id)
+        .order_by(Chat.created_at, Chat.id, Message.timestamp, Message.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        yield partition
+
+async def get_chat_history(db: AsyncSession, chat_id: UUID) -> List[CachedMessage]:
+    """
+    История чата для контекста нейросети. При попадании в кэш история берется из памяти.
+    Если в чат могут писать другие процессы (history_cache_sync_on_hit), из БД
+    дополнительно догружаются только сообщения новее последнего прочитанного.
+    """
+    columns = (Message.id, Message.is_assistant, Message.content)
+    stmt = select(*columns).where(Message.chat_id == chat_id)
+
+    if settings.history_cache.enabled and chat_history_cache.get(chat_id) is not None:
+        if settings.history_cache_sync_on_hit:
+            delta_stmt = stmt.where(Message.id > chat_history_cache.synced_id(chat_id)).order_by(Message.id)
+            chat_history_cache.sync(chat_id, [tuple(row) for row in await db.execute(delta_stmt)])
+        history = chat_history_cache.get(chat_id)
+        if history is not None:
+            return list(history)
+        # Кэш сбросил чат при догрузке - читаем целиком
+
+    history = [tuple(row) for row in await db.execute(stmt.order_by(Message.timestamp, Message.id))]
+    if settings.history_cache.enabled:
+        chat_history_cache.set(chat_id, history)
+    return history
 
 async def add_message(db: AsyncSession, chat_id: UUID, content: str) -> Tuple[Message, Message]:
     # Сохраняем сообщение пользователя
@@ -55,10 +118,12 @@ async def add_message(db: AsyncSession, chat_id: UUID, content: str) -> Tuple[Me
     )
     db.add(user_message)
     await db.commit()
-    await db.refresh(user_message)
+    # Только колонки: полный refresh через selectin-связь Message.chat подтянул бы все сообщения чата
+    await db.refresh(user_message, MESSAGE_FIELDS)
+    chat_history_cache.append(chat_id, (user_message.id, False, user_message.content))
 
-    # Получаем историю сообщений для контекста
-    chat_messages = await get_chat_messages(db, chat_id)
+    # Получаем историю сообщений для контекста (из кэша активных чатов, если есть)
+    chat_history = await get_chat_history(db, chat_id)
     
     # Формируем контекст для нейросети
     messages_for_ai = [
@@ -69,11 +134,11 @@ async def add_message(db: AsyncSession, chat_id: UUID, content: str) -> Tuple[Me
     ]
     
     # Добавляем историю сообщений с учетом их типа
-    for msg in chat_messages:
-        role = "assistant" if msg.is_assistant else "user"
+    for _, is_assistant, msg_content in chat_history:
+        role = "assistant" if is_assistant else "user"
         messages_for_ai.append({
             "role": role,
-            "content": msg.content
+            "content": msg_content
         })
 
     # Получаем ответ от нейросети
@@ -87,14 +152,44 @@ async def add_message(db: AsyncSession, chat_id: UUID, content: str) -> Tuple[Me
     )
     db.add(ai_message)
     await db.commit()
-    await db.refresh(ai_message)
+    await db.refresh(ai_message, MESSAGE_FIELDS)
+
+    # Write-through: следующий ход возьмет историю из памяти
+    chat_history_cache.append(chat_id, (ai_message.id, True, ai_message.content))
 
     return user_message, ai_message
 
 async def delete_chat(db: AsyncSession, chat_id: UUID, user_id: Optional[UUID] = None) -> bool:
-    chat = await get_chat(db, chat_id, user_id)
-    if chat:
-        await db.delete(chat)
-        await db.commit()
-        return True
-    return False
\ No newline at end of file
+    # Один DELETE ... RETURNING без загрузки чата; сообщения удаляет каскад в БД
+    stmt = _chat_access_filter(delete(Chat).where(Chat.id == chat_id), user_id)
+    stmt = stmt.returning(Chat.id).execution_options(synchronize_session=False)
+    result = await db.execute(stmt)
+    deleted = result.scalar_one_or_none()
+    await db.commit()
+    if deleted is None:
+        return False
+    chat_history_cache.invalidate(chat_id)
+    return True
+
+async def delete_chats(
+    db: AsyncSession,
+    user_id: Optional[UUID] = None,
+    chat_ids: Optional[List[UUID]] = None,
+    older_than: Optional[datetime] = None
+) -> List[UUID]:
+    """Удаляет одним запросом чаты, подходящие под все заданные условия: из списка и созданные раньше older_than."""
+    if not chat_ids and older_than is None:
+        # Без условий запрос удалил бы все доступные чаты
+        return []
+    stmt = _chat_access_filter(delete(Chat), user_id)
+    if chat_ids:
+        stmt = stmt.where(Chat.id.in_(chat_ids))
+    if older_than is not None:
+        stmt = stmt.where(Chat.created_at < older_than)
+    stmt = stmt.returning(Chat.id).execution_options(synchronize_session=False)
+    result = await db.execute(stmt)
+    deleted = list(result.scalars().all())
+    await db.commit()
+    for chat_id in deleted:
+        chat_history_cache.invalidate(chat_id)
+    return deleted
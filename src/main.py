@@ -7,14 +7,23 @@ from fastapi.middleware.cors import CORSMiddleware
 from api import router as api_router
 from core.settings import settings
 from core.db_helper import db_helper
+from core.neural_network import close_ai_client
+from core.rate_limit import rate_limit_store
+from core.warmup import warm_up, warmup_state
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 Приложение запускается...")
+    await warm_up()
     yield
+    # К этому моменту uvicorn уже дождался активных запросов (и генераций в них)
+    # в пределах timeout_graceful_shutdown, остается освободить ресурсы
     print("🛑 Приложение выключается...")
-    db_helper.dispose()
+    await warmup_state.stop_ai_monitor()
+    await close_ai_client()
+    await rate_limit_store.close()
+    await db_helper.dispose()
 
 
 app = FastAPI(
@@ -36,7 +45,8 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type", "Accept"]
+    allow_headers=["Authorization", "Content-Type", "Accept"],
+    expose_headers=["Retry-After"]
 )
 
 app.include_router(
@@ -49,5 +59,10 @@ if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host=settings.run.host,
-        port=settings.run.port
+        port=settings.run.port,
+        workers=settings.run.workers,
+        loop=settings.run.loop,
+        http=settings.run.http,
+        timeout_graceful_shutdown=settings.run.graceful_shutdown_timeout,
+        forwarded_allow_ips=settings.run.forwarded_allow_ips,
     )
\ No newline at end of file